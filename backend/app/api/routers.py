@@ -1,7 +1,17 @@
+from contextlib import asynccontextmanager
 from  fastapi import  FastAPI
 from .endpoints.query_api import MainApi
 from ..models.api_models import *
-app = FastAPI()
+from ..config import check_settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail the worker at startup, not on the first request that needs settings.
+    check_settings()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 query_router=MainApi(prefix="/api/query",model=QueryAPI,tags="query")
 query_router.add_routes()
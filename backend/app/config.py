@@ -1,14 +1,20 @@
 # core/config.py
 
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from pydantic import SecretStr, Field, ValidationError
 
 class Settings(BaseSettings):
     HUGGING_FACE_KEY: SecretStr= Field(..., env="HUGGING_FACE_KEY")
     VECTOR_DB_PATH: str = Field(default="vector_db", env="VECTOR_DB_PATH")
+    VECTOR_SNAPSHOT_PATH: Optional[str] = Field(default=None, env="VECTOR_SNAPSHOT_PATH")
+    VECTOR_SNAPSHOT_VERIFY: bool = Field(default=False, env="VECTOR_SNAPSHOT_VERIFY")
     MAX_TOKENS_PER_CHUNK: int = Field(default=500, env="MAX_TOKENS_PER_CHUNK")
     MODEL_NAME: str = Field(default="text-embedding-3-small", env="EMBEDDING_MODEL")
     DATABASE_URL:str = Field(default="sqlite:///database.db", env="DATABASE_URL")
+    DATABASE_ECHO:bool = Field(default=False, env="DATABASE_ECHO")
     SUPABASE_URL:str=Field(...,env="SUPABASE_URL")
     SUPABASE_KEY:SecretStr=Field(...,enc="SUPABASE_KEY")
     SUPABASE_SERVICE_ROLE_KEY:SecretStr=Field(...,env="SUPABASE_SERVICE_ROLE_KEY")
@@ -18,14 +24,39 @@ class Settings(BaseSettings):
         env_file =".env"
         env_file_encoding = "utf-8"
 
-try:
-    settings = Settings()
-except ValidationError as e:
-    print(" Environment configuration is invalid:")
-    print(e.json(indent=2))
-    raise SystemExit(1)
+
+class ConfigurationError(RuntimeError):
+    """The environment is missing settings or has invalid ones."""
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    # Validated on first use rather than at import. A normal exception here,
+    # so a request that reaches it fails with a 500 instead of killing the worker.
+    try:
+        return Settings()
+    except ValidationError as e:
+        raise ConfigurationError(f"Environment configuration is invalid:\n{e.json(indent=2)}") from e
+
+
+def check_settings() -> Settings:
+    """Startup check for scripts and the API lifespan: report and exit on bad config."""
+    try:
+        return get_settings()
+    except ConfigurationError as e:
+        print(f" {e}")
+        raise SystemExit(1)
+
+
+def __getattr__(name: str):
+    # Keeps `from backend.app.config import settings` working for scripts/tests.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    settings = check_settings()
     print("Configuration loaded successfully.")
     print("Vector DB Path:", settings.VECTOR_DB_PATH)
     print("Model Name:", settings.MODEL_NAME)
@@ -30,6 +30,8 @@ class CacheMemory:
     def get(self, key: str) -> Dict[str, Any] | None:
         return self.cache.get(key)
 
-    def set(self, key: str, value: Dict[str, Any]):
+    def set(self, key: str, value: Dict[str, Any], persist: bool = True):
+        # persist=False lets callers batch many entries and save() once.
         self.cache[key] = value
-        self.save()
+        if persist:
+            self.save()
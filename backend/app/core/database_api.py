@@ -1,14 +1,25 @@
 from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING
 
 
-from backend.app.config import settings
+from backend.app.config import get_settings
 import requests
-from supabase import create_client,Client
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 @dataclass
 class DocDatabase:
-    bucket_name: str = field(default_factory=lambda: settings.BUCKET_NAME)
-    supabase:Client=create_client(settings.SUPABASE_URL,settings.SUPABASE_SERVICE_ROLE_KEY.get_secret_value())
+    bucket_name: str = field(default_factory=lambda: get_settings().BUCKET_NAME)
+
+    @cached_property
+    def supabase(self) -> "Client":
+        # Created on first storage call; the supabase SDK is only imported then.
+        from supabase import create_client
+
+        settings = get_settings()
+        return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY.get_secret_value())
 
     def upload_file(self, path: str, cache_data: bytes) -> bool:
         upload_url = f'public/{path}'
@@ -42,11 +53,22 @@ class DocDatabase:
 
 from typing import Type, TypeVar, List, Optional, Sequence, Union
 from sqlmodel import SQLModel, select, Session, create_engine
+from sqlalchemy.engine import Engine
 
 T = TypeVar("T", bound=SQLModel)
 
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    # One engine per process, built when the first session is opened.
+    settings = get_settings()
+    return create_engine(settings.DATABASE_URL, echo=settings.DATABASE_ECHO)
+
+
 class ApiDatabase:
-    engine = create_engine(settings.DATABASE_URL, echo=True)
+    @property
+    def engine(self) -> Engine:
+        return get_engine()
 
     def get_session(self) -> Session:
         return Session(self.engine)
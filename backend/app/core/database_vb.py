@@ -0,0 +1,556 @@
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .logger import setup_logger
+
+logger = setup_logger("vector_snapshot")
+
+# File layout: MAGIC | u32 header length | JSON header | zero pad to DATA_ALIGN |
+# float32 vectors (count x dim, row-major) |
+# metadata block: u64 line offsets (count + 1) | one JSON metadata dict per line |
+# record block: u64 line offsets (count + 1) | one JSON line {id, text} per record.
+# Metadata is kept apart from chunk text so filters never decode the text.
+# The header checksum is the sha256 of everything from the data offset onwards.
+MAGIC = b"IVSNAP\x00\x00"
+SNAPSHOT_VERSION = 3
+DATA_ALIGN = 64
+_PREFIX = struct.Struct("<8sI")
+# A sharded index is a directory of snapshot files listed in this manifest.
+# The manifest it replaced is kept as MANIFEST_PREV, and so are its shards.
+MANIFEST = "manifest.json"
+MANIFEST_PREV = "manifest.prev.json"
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# One controller for the process: creating one scans every loaded library.
+_blas_lock = threading.Lock()
+_blas_controller = None
+_blas_limit: Optional[int] = None
+
+
+def limit_blas_threads(limit: int = 1) -> None:
+    """Cap BLAS at ``limit`` threads for the rest of the process.
+
+    Shard workers each run a matrix product; with a BLAS pool behind every one
+    of them the fan-out oversubscribes the CPU. The limit is process-wide and
+    set once, when a multi-shard index is built, not toggled per query.
+    """
+    global _blas_controller, _blas_limit
+    with _blas_lock:
+        if _blas_limit == limit:
+            return
+        if _blas_controller is None:
+            try:
+                from threadpoolctl import ThreadpoolController
+            except ImportError:
+                logger.warning("threadpoolctl is not installed; shard workers will oversubscribe BLAS threads")
+                return
+            _blas_controller = ThreadpoolController()
+        _blas_controller.limit(limits=limit, user_api="blas")
+        _blas_limit = limit
+
+
+def _data_offset(header_len: int) -> int:
+    end = _PREFIX.size + header_len
+    return -(-end // DATA_ALIGN) * DATA_ALIGN
+
+
+def _encode_lines(items: Sequence[Dict[str, Any]]) -> bytes:
+    lines = [json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items]
+    offsets = np.zeros(len(lines) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(line) for line in lines])
+    return offsets.tobytes() + b"".join(lines)
+
+
+def _encode_snapshot(
+    ids: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    texts: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    model_name: str = "",
+    dim: Optional[int] = None,
+) -> Tuple[bytes, Tuple[bytes, ...], str]:
+    if not (len(ids) == len(embeddings) == len(texts) == len(metadatas)):
+        raise ValueError("ids, embeddings, texts and metadatas must have the same length.")
+
+    if len(ids):
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype="<f4").reshape(len(ids), -1))
+    else:
+        vectors = np.empty((0, dim or 0), dtype="<f4")
+    vector_bytes = vectors.tobytes()
+    metadata = _encode_lines(metadatas)
+    records = _encode_lines([{"id": i, "text": t} for i, t in zip(ids, texts)])
+
+    sha = hashlib.sha256()
+    for part in (vector_bytes, metadata, records):
+        sha.update(part)
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "dtype": "<f4",
+        "vectors_nbytes": len(vector_bytes),
+        "metadata_nbytes": len(metadata),
+        "records_nbytes": len(records),
+        "sha256": sha.hexdigest(),
+        "model_name": model_name,
+        "created_at": time.time(),
+    }).encode("utf-8")
+    return header, (vector_bytes, metadata, records), sha.hexdigest()
+
+
+def _write_atomic(path: str, *parts: bytes) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        for part in parts:
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_snapshot(path: str, header: bytes, body: Sequence[bytes]) -> None:
+    padding = b"\x00" * (_data_offset(len(header)) - _PREFIX.size - len(header))
+    _write_atomic(path, _PREFIX.pack(MAGIC, len(header)), header, padding, *body)
+
+
+def export_snapshot(
+    path: str,
+    ids: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    texts: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    model_name: str = "",
+    dim: Optional[int] = None,
+) -> str:
+    """Write one self-contained snapshot file and return its checksum.
+
+    The file is written next to ``path`` and renamed into place, so readers
+    never observe a partially written snapshot. ``dim`` is only needed to
+    record the vector width of an empty snapshot.
+    """
+    header, body, checksum = _encode_snapshot(ids, embeddings, texts, metadatas, model_name, dim)
+    _write_snapshot(path, header, body)
+    logger.info(f"Exported snapshot of {len(ids)} chunks to '{path}'")
+    return checksum
+
+
+def shard_for(key: str, n_shards: int) -> int:
+    """Jump consistent hash of ``key``: growing N moves only ~1/N of the keys."""
+    h = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+    b, j = -1, 0
+    while j < n_shards:
+        b = j
+        h = (h * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((h >> 33) + 1)))
+    return b
+
+
+def _document_key(doc_id: str, metadata: Dict[str, Any]) -> str:
+    # All chunks of a document land in the same shard.
+    return str(metadata.get("filename") or doc_id)
+
+
+def export_sharded_snapshot(
+    index_dir: str,
+    ids: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    texts: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    n_shards: int,
+    model_name: str = "",
+) -> Dict[str, Any]:
+    """Split chunks into ``n_shards`` snapshot files plus a ``manifest.json``.
+
+    Shard files are named after their checksum, so a shard whose contents did
+    not change is reused as-is. The manifest is replaced last, which is the
+    point at which readers see the new layout. The previous manifest and its
+    shards stay on disk for one more generation, so a reader that opened the
+    old manifest can still map every file it lists.
+    """
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1.")
+    os.makedirs(index_dir, exist_ok=True)
+
+    groups: List[List[int]] = [[] for _ in range(n_shards)]
+    for i, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+        groups[shard_for(_document_key(doc_id, metadata), n_shards)].append(i)
+    # Shards that receive no document still record the vector width.
+    dim = int(np.asarray(embeddings[0]).shape[-1]) if len(ids) else None
+
+    shards = []
+    for shard_no, rows in enumerate(groups):
+        header, body, checksum = _encode_snapshot(
+            [ids[i] for i in rows], [embeddings[i] for i in rows],
+            [texts[i] for i in rows], [metadatas[i] for i in rows], model_name, dim,
+        )
+        filename = f"shard-{shard_no:03d}-{checksum[:16]}.snap"
+        if not os.path.exists(os.path.join(index_dir, filename)):
+            _write_snapshot(os.path.join(index_dir, filename), header, body)
+        shards.append({"file": filename, "sha256": checksum, "count": len(rows)})
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "n_shards": n_shards,
+        "model_name": model_name,
+        "sha256": hashlib.sha256("".join(s["sha256"] for s in shards).encode()).hexdigest(),
+        "shards": shards,
+    }
+    manifest_path = os.path.join(index_dir, MANIFEST)
+    live = {s["file"] for s in shards}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "rb") as f:
+            previous = f.read()
+        _write_atomic(os.path.join(index_dir, MANIFEST_PREV), previous)
+        live.update(s["file"] for s in json.loads(previous)["shards"])
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    # Files of older generations; a mapped file may refuse removal (Windows).
+    for name in os.listdir(index_dir):
+        if name.endswith(".snap") and name not in live:
+            try:
+                os.remove(os.path.join(index_dir, name))
+            except OSError as e:
+                logger.warning(f"Could not remove stale shard {name}: {e}")
+
+    logger.info(f"Exported {len(ids)} chunks to {n_shards} shards in '{index_dir}'")
+    return manifest
+
+
+def rebalance_shards(
+    index_dir: str,
+    n_shards: Optional[int] = None,
+    ids: Sequence[str] = (),
+    embeddings: Sequence[Sequence[float]] = (),
+    texts: Sequence[str] = (),
+    metadatas: Sequence[Dict[str, Any]] = (),
+) -> Dict[str, Any]:
+    """Upsert new chunks into a sharded index and/or change its shard count.
+
+    Records with an existing id replace the old ones. Only shards whose
+    contents change are rewritten.
+    """
+    index = ShardedIndex.load(index_dir, verify=True)
+    merged: Dict[str, Tuple[Any, str, Dict[str, Any]]] = {}
+    for shard in index.shards:
+        for row, doc_id in enumerate(shard.ids):
+            merged[doc_id] = (shard.vectors[row], shard.texts[row], shard.metadatas[row])
+    for doc_id, vector, text, metadata in zip(ids, embeddings, texts, metadatas):
+        merged[doc_id] = (vector, text, metadata)
+
+    all_ids = list(merged)
+    return export_sharded_snapshot(
+        index_dir,
+        ids=all_ids,
+        embeddings=[merged[i][0] for i in all_ids],
+        texts=[merged[i][1] for i in all_ids],
+        metadatas=[merged[i][2] for i in all_ids],
+        n_shards=n_shards or index.header["n_shards"],
+        model_name=index.header.get("model_name", ""),
+    )
+
+
+def export_chroma_snapshot(
+    db_path: str,
+    path: str,
+    collection_name: str = "langchain",
+    model_name: str = "",
+    n_shards: Optional[int] = None,
+):
+    """Bundle a Chroma persist directory into a snapshot file.
+
+    With ``n_shards``, ``path`` is a directory and a sharded index is written.
+    """
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    records = dict(
+        ids=data["ids"],
+        embeddings=data["embeddings"],
+        texts=data["documents"],
+        metadatas=[m or {} for m in data["metadatas"]],
+        model_name=model_name,
+    )
+    if n_shards:
+        return export_sharded_snapshot(path, n_shards=n_shards, **records)
+    return export_snapshot(path, **records)
+
+
+class VectorSnapshot:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    Vectors stay in the page cache and are shared between processes serving
+    the same file. Metadata filters use the same ``where`` syntax as Chroma
+    and are resolved to a row mask before any scoring happens.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], buf: mmap.mmap, offset: int):
+        self.path = path
+        self.header = header
+        count, dim = header["count"], header["dim"]
+        self.vectors = np.frombuffer(buf, dtype=header["dtype"], count=count * dim, offset=offset).reshape(count, dim)
+        self._buf = buf
+        metadata_start = offset + header["vectors_nbytes"]
+        self._meta_offsets, self._meta_start = self._line_index(metadata_start)
+        self._offsets, self._lines_start = self._line_index(metadata_start + header["metadata_nbytes"])
+        self._postings: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def _line_index(self, start: int) -> Tuple[np.ndarray, int]:
+        offsets = np.frombuffer(self._buf, dtype="<u8", count=len(self) + 1, offset=start)
+        return offsets, start + offsets.nbytes
+
+    @classmethod
+    def load(cls, path: str, verify: bool = False) -> "VectorSnapshot":
+        """Map ``path``. Records are decoded on demand, not here.
+
+        Only the header is validated (magic, version, size). ``verify`` also
+        hashes the whole file against the header checksum, which costs
+        O(file size); do that once at rollout (:func:`verify_snapshot`).
+        """
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_len = _PREFIX.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a vector snapshot.")
+        header = json.loads(buf[_PREFIX.size:_PREFIX.size + header_len])
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {header.get('version')} in {path}.")
+
+        offset = _data_offset(header_len)
+        end = offset + header["vectors_nbytes"] + header["metadata_nbytes"] + header["records_nbytes"]
+        if len(buf) < end:
+            raise ValueError(f"Snapshot {path} is truncated.")
+        if verify and hashlib.sha256(memoryview(buf)[offset:end]).hexdigest() != header["sha256"]:
+            raise ValueError(f"Checksum mismatch for snapshot {path}.")
+        return cls(path, header, buf, offset)
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def _line(self, offsets: np.ndarray, start: int, row: int) -> bytes:
+        return self._buf[start + int(offsets[row]):start + int(offsets[row + 1])]
+
+    def _block(self, offsets: np.ndarray, start: int) -> List[Any]:
+        return [json.loads(line) for line in self._buf[start:start + int(offsets[-1])].splitlines()]
+
+    @cached_property
+    def _records(self) -> List[Dict[str, Any]]:
+        return self._block(self._offsets, self._lines_start)
+
+    @cached_property
+    def ids(self) -> List[str]:
+        return [r["id"] for r in self._records]
+
+    @cached_property
+    def texts(self) -> List[str]:
+        return [r["text"] for r in self._records]
+
+    @cached_property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return self._block(self._meta_offsets, self._meta_start)
+
+    def record(self, row: int) -> Dict[str, Any]:
+        record = json.loads(self._line(self._offsets, self._lines_start, row))
+        metadata = json.loads(self._line(self._meta_offsets, self._meta_start, row))
+        return {"text": record["text"], "metadata": metadata}
+
+    def _posting(self, field: str) -> Dict[Any, np.ndarray]:
+        if field not in self._postings:
+            rows: Dict[Any, List[int]] = {}
+            for row, meta in enumerate(self.metadatas):
+                if field in meta:
+                    rows.setdefault(meta[field], []).append(row)
+            self._postings[field] = {value: np.asarray(r, dtype=np.int64) for value, r in rows.items()}
+        return self._postings[field]
+
+    def _column(self, field: str) -> np.ndarray:
+        if field not in self._columns:
+            values = [meta.get(field) for meta in self.metadatas]
+            self._columns[field] = np.asarray(
+                [v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values],
+                dtype=np.float64,
+            )
+        return self._columns[field]
+
+    def _rows_equal(self, field: str, values: Sequence[Any]) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        posting = self._posting(field)
+        for value in values:
+            rows = posting.get(value)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a Chroma-style ``where`` clause."""
+        mask = np.ones(len(self), dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self.mask(sub)
+            elif key == "$or":
+                mask &= np.logical_or.reduce([self.mask(sub) for sub in cond]) if cond else False
+            else:
+                if not isinstance(cond, dict):
+                    cond = {"$eq": cond}
+                for op, value in cond.items():
+                    if op == "$eq":
+                        mask &= self._rows_equal(key, [value])
+                    elif op == "$ne":
+                        mask &= ~self._rows_equal(key, [value])
+                    elif op == "$in":
+                        mask &= self._rows_equal(key, value)
+                    elif op == "$nin":
+                        mask &= ~self._rows_equal(key, value)
+                    elif op in ("$gt", "$gte", "$lt", "$lte"):
+                        column = self._column(key)
+                        with np.errstate(invalid="ignore"):
+                            mask &= {
+                                "$gt": column > value,
+                                "$gte": column >= value,
+                                "$lt": column < value,
+                                "$lte": column <= value,
+                            }[op]
+                    else:
+                        raise ValueError(f"Unsupported filter operator {op}.")
+        return mask
+
+    def search(self, query_vector: Sequence[float], k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[float, int]]:
+        """Top-``k`` ``(score, row)`` pairs by inner product, best first."""
+        if len(self) == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if filter:
+            rows = np.flatnonzero(self.mask(filter))
+            scores = self.vectors[rows] @ query
+        else:
+            rows = None
+            scores = self.vectors @ query
+
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), int(rows[i] if rows is not None else i)) for i in top]
+
+
+
+class ShardedIndex:
+    """Fan a query out over the shards of a sharded snapshot directory.
+
+    Each shard is scored on a worker thread (NumPy releases the GIL during the
+    matrix product). Building a multi-shard index limits BLAS to one thread
+    for the process, so parallelism comes from the fan-out rather than BLAS. The per-shard top-``k`` lists are
+    merged with a heap. Result refs are ``(shard, row)`` pairs, resolved
+    through :meth:`record`. A single-shard index searches inline.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], shards: List[VectorSnapshot], max_workers: Optional[int] = None):
+        self.path = path
+        self.header = header
+        self.shards = shards
+        workers = max_workers or max(1, min(len(shards), available_cores()))
+        self.pool = None
+        if len(shards) > 1:
+            limit_blas_threads(1)
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
+
+    def close(self) -> None:
+        """Release the worker threads; queries still running finish first."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    def __del__(self):
+        # After a hot swap the old index goes away once its last query returns.
+        self.close()
+
+    @classmethod
+    def load(cls, index_dir: str, verify: bool = False, max_workers: Optional[int] = None) -> "ShardedIndex":
+        with open(os.path.join(index_dir, MANIFEST), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported manifest version {header.get('version')} in {index_dir}.")
+        shards = []
+        for entry in header["shards"]:
+            shard = VectorSnapshot.load(os.path.join(index_dir, entry["file"]), verify=verify)
+            if shard.header["sha256"] != entry["sha256"]:
+                raise ValueError(f"Shard {entry['file']} does not match the manifest.")
+            shards.append(shard)
+        return cls(index_dir, header, shards, max_workers=max_workers)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def record(self, ref: Tuple[int, int]) -> Dict[str, Any]:
+        shard, row = ref
+        return self.shards[shard].record(row)
+
+    def search(self, query_vector: Sequence[float], k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[float, Tuple[int, int]]]:
+        """Top-``k`` ``(score, (shard, row))`` pairs across all shards, best first."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if self.pool is None:
+            return [(score, (shard_no, row)) for shard_no, shard in enumerate(self.shards)
+                    for score, row in shard.search(query, k, filter)]
+
+        futures = [self.pool.submit(shard.search, query, k, filter) for shard in self.shards]
+        hits = [
+            (score, (shard_no, row))
+            for shard_no, future in enumerate(futures)
+            for score, row in future.result()
+        ]
+        return heapq.nlargest(k, hits, key=itemgetter(0))
+
+
+def verify_snapshot(path: str) -> str:
+    """Hash a snapshot file, or every shard of an index directory, against its
+    recorded checksums. Run once at rollout; serving loads skip it.
+
+    Returns the snapshot (or manifest) checksum, raises ValueError on mismatch.
+    """
+    if os.path.isdir(path):
+        index = ShardedIndex.load(path, verify=True, max_workers=1)
+        index.close()
+        return index.header["sha256"]
+    return VectorSnapshot.load(path, verify=True).header["sha256"]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) == 3 and sys.argv[1] == "verify":
+        try:
+            print("Snapshot verified:", verify_snapshot(sys.argv[2]))
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+        raise SystemExit(0)
+    if len(sys.argv) not in (3, 4):
+        print("usage: python -m backend.app.core.database_vb <chroma_persist_dir> <snapshot_file|index_dir> [n_shards]\n"
+              "       python -m backend.app.core.database_vb verify <snapshot_file|index_dir>")
+        raise SystemExit(2)
+    n_shards = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    result = export_chroma_snapshot(sys.argv[1], sys.argv[2], model_name="all-MiniLM-L6-v2", n_shards=n_shards)
+    print("Snapshot checksum:", result["sha256"] if n_shards else result)
@@ -1,7 +1,149 @@
 
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+from typing import List, Optional, Tuple
+
+# Listeners created by setup_logger(use_queue=True), stopped (and flushed) at exit.
+_listeners: List["LazyQueueListener"] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info or record.exc_text:
+            payload["exc_info"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Throttle high-frequency records below WARNING.
+
+    Records are grouped by their unformatted message template. Each group keeps
+    at most ``max_per_interval`` records per ``interval`` seconds, and of those
+    only every ``sample_every``-th one. Warnings and errors always pass.
+
+    Grouping only works for %-style calls (``logger.info("got %d", n)``): an
+    f-string message is a new template every time and is never throttled.
+    At most ``max_keys`` templates are tracked, least recently seen evicted first.
+    """
+
+    def __init__(self, max_per_interval: Optional[int] = None, interval: float = 1.0, sample_every: int = 1,
+                 max_keys: int = 1024):
+        super().__init__()
+        self.max_per_interval = max_per_interval
+        self.interval = interval
+        self.sample_every = max(1, sample_every)
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # template -> (window start, emitted in window, seen in total), in LRU order
+        self._state: "OrderedDict[Tuple[str, int], Tuple[float, int, int]]" = OrderedDict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (str(record.msg), record.levelno)
+        now = time.monotonic()
+        with self._lock:
+            start, emitted, seen = self._state.get(key, (now, 0, 0))
+            if now - start >= self.interval:
+                start, emitted = now, 0
+            seen += 1
+            keep = (seen - 1) % self.sample_every == 0
+            if keep and self.max_per_interval is not None and emitted >= self.max_per_interval:
+                keep = False
+            if keep:
+                emitted += 1
+            self._state[key] = (start, emitted, seen)
+            self._state.move_to_end(key)
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+        return keep
+
+
+class LazyQueueListener(QueueListener):
+    """QueueListener whose thread starts with the first record.
+
+    Loggers are configured at import, so starting the thread there would be an
+    import side effect. A forked child gets a fresh queue and starts its own
+    thread on its first record; the parent's thread does not exist there.
+    """
+
+    def __init__(self, *handlers: logging.Handler, respect_handler_level: bool = False):
+        super().__init__(queue.SimpleQueue(), *handlers, respect_handler_level=respect_handler_level)
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self.start()
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+    def _reset_after_fork(self):
+        self._start_lock = threading.Lock()
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+
+
+class ListenerQueueHandler(QueueHandler):
+    """Enqueues to a LazyQueueListener, starting it if needed.
+
+    The stock prepare() renders the traceback into the message and drops
+    exc_info, which leaves JsonFormatter nothing for its "exc_info" field.
+    Here the message is merged with its args but the exception stays separate.
+    """
+
+    def __init__(self, listener: LazyQueueListener):
+        super().__init__(listener.queue)
+        self.listener = listener
+
+    def enqueue(self, record: logging.LogRecord):
+        self.listener.ensure_started()
+        self.listener.queue.put_nowait(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # Render now: the listener runs after the frames have moved on
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def _stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _reset_listeners_after_fork():
+    for listener in _listeners:
+        listener._reset_after_fork()
+
+
+atexit.register(_stop_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_listeners_after_fork)
+
 
 def setup_logger(
     name: str = "app",
@@ -9,24 +151,42 @@ def setup_logger(
     log_to_file: bool = True,
     log_file_path: str = "logs/app.log",
     max_bytes: int = 5 * 1024 * 1024,  # 5 MB
-    backup_count: int = 3
+    backup_count: int = 3,
+    use_queue: bool = False,
+    json_format: bool = False,
+    rate_limit: Optional[int] = None,
+    sample_every: int = 1,
 ) -> logging.Logger:
+    """Configure ``name`` once and return it.
 
+    ``use_queue`` hands records to a listener thread, started on the first
+    record, so callers never block on file or console I/O. ``json_format`` switches to one JSON object per line.
+    ``rate_limit`` (records per second per message) and ``sample_every`` (keep
+    one in N) thin out repetitive INFO/DEBUG messages.
+    """
 
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
 
-    # Avoid adding multiple handlers to the same logger
-    if logger.hasHandlers():
+    # Avoid adding multiple handlers to the same logger. Only this logger's own
+    # handlers count: modules calling logging.basicConfig() give root a handler.
+    if logger.handlers:
         return logger
+    # Records are emitted here; propagating would also write them synchronously via root.
+    logger.propagate = False
+
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 
-    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    handlers = []
 
     # Console handler
     ch = logging.StreamHandler()
     ch.setLevel(log_level)
     ch.setFormatter(formatter)
-    logger.addHandler(ch)
+    handlers.append(ch)
 
     # File handler
     if log_to_file:
@@ -34,6 +194,18 @@ def setup_logger(
         fh = RotatingFileHandler(log_file_path, maxBytes=max_bytes, backupCount=backup_count)
         fh.setLevel(log_level)
         fh.setFormatter(formatter)
-        logger.addHandler(fh)
+        handlers.append(fh)
+
+    # Filter on the logger itself so dropped records are never formatted or queued
+    if rate_limit is not None or sample_every > 1:
+        logger.addFilter(RateLimitFilter(max_per_interval=rate_limit, sample_every=sample_every))
+
+    if use_queue:
+        listener = LazyQueueListener(*handlers, respect_handler_level=True)
+        _listeners.append(listener)
+        logger.addHandler(ListenerQueueHandler(listener))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
 
     return logger
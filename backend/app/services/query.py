@@ -1,40 +1,125 @@
 import os
-from typing import List, Dict
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Sequence, Tuple, Union
 
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-
-from ..config import settings
+from ..config import get_settings
 from ..core.logger import setup_logger
 
-# Set Hugging Face token from your secret settings
-os.environ["HUGGINGFACEHUB_API_TOKEN"] = settings.HUGGING_FACE_KEY.get_secret_value()
+if TYPE_CHECKING:
+    from ..core.database_vb import ShardedIndex, VectorSnapshot
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+    from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+logger = setup_logger("query_service", use_queue=True, rate_limit=20)
+
+
+def _match(field: str, value: Union[Any, Sequence[Any]]) -> Dict[str, Any]:
+    if isinstance(value, (list, tuple, set)):
+        return {field: {"$in": list(value)}}
+    return {field: {"$eq": value}}
+
+
+def build_metadata_filter(
+    filename: Union[str, Sequence[str], None] = None,
+    page: Union[int, Sequence[int], None] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """Translate chunk metadata constraints into a Chroma ``where`` clause.
 
-logger = setup_logger("query_service")
+    The clause is evaluated inside the index before scoring, so a filtered
+    search still returns up to ``k`` matching chunks. Returns None when no
+    constraint is given.
+    """
+    clauses = []
+    if filename is not None:
+        clauses.append(_match("filename", filename))
+    if page is not None:
+        clauses.append(_match("page", page))
+    if page_range is not None:
+        clauses.append({"page": {"$gte": page_range[0]}})
+        clauses.append({"page": {"$lte": page_range[1]}})
+    if uploaded_after is not None:
+        clauses.append({"upload_ts": {"$gte": uploaded_after.timestamp()}})
+    if uploaded_before is not None:
+        clauses.append({"upload_ts": {"$lte": uploaded_before.timestamp()}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
 
 
 class QueryService:
-    def __init__(self, db_path: str = None):
+    EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+    def __init__(self, db_path: str = None, snapshot_path: str = None):
+        settings = get_settings()
         self.db_path = db_path or settings.VECTOR_DB_PATH
 
-        # Embedding model for vector store
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
+        # Set Hugging Face token from your secret settings
+        os.environ["HUGGINGFACEHUB_API_TOKEN"] = settings.HUGGING_FACE_KEY.get_secret_value()
+
+        # When set, queries are served from this snapshot instead of Chroma
+        self._snapshot: Union["VectorSnapshot", "ShardedIndex", None] = None
+        snapshot_path = snapshot_path or settings.VECTOR_SNAPSHOT_PATH
+        if snapshot_path:
+            self.load_snapshot(snapshot_path, verify=settings.VECTOR_SNAPSHOT_VERIFY)
+
+    def load_snapshot(self, path: str, verify: bool = False) -> None:
+        """Load ``path``, then swap it in for subsequent queries.
+
+        ``path`` is a snapshot file or a sharded index directory. Queries
+        already running keep the snapshot they started with; the old mapping
+        is released once the last of them returns. Only headers are checked
+        unless ``verify`` is set, which hashes every file; snapshots are
+        expected to be verified once at rollout instead.
+        """
+        from ..core.database_vb import ShardedIndex, VectorSnapshot
+
+        loader = ShardedIndex.load if os.path.isdir(path) else VectorSnapshot.load
+        snapshot = loader(path, verify=verify)
+        model_name = snapshot.header.get("model_name")
+        if model_name and model_name != self.EMBEDDING_MODEL_NAME:
+            logger.warning(f"Snapshot {path} was built with {model_name}, queries use {self.EMBEDDING_MODEL_NAME}")
+        self._snapshot = snapshot  # single reference assignment, atomic for readers
+        logger.info(f"Serving {len(snapshot)} chunks from snapshot {path} ({snapshot.header['sha256'][:12]})")
+
+    @cached_property
+    def embedding_model(self) -> "HuggingFaceEmbeddings":
+        # Embedding model for vector store, loaded on the first query
+        from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=self.EMBEDDING_MODEL_NAME,
             encode_kwargs={"normalize_embeddings": True}
         )
 
+    @cached_property
+    def vectorstore(self) -> "Chroma":
         # Initialize Chroma vector store
-        self.vectorstore = Chroma(
+        from langchain_chroma import Chroma
+
+        return Chroma(
             persist_directory=self.db_path,
             embedding_function=self.embedding_model
         )
 
-    def query(self, user_query: str, k: int = 5) -> List[Dict]:
+    def query(self, user_query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Top-``k`` chunks for ``user_query``.
+
+        ``filter`` is a Chroma ``where`` clause, usually built with
+        :func:`build_metadata_filter`; it is applied by the index itself.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return self._query_snapshot(snapshot, user_query, k, filter)
         try:
-            logger.info(f"Running vector similarity search for: {user_query}")
-            docs: List[Document] = self.vectorstore.similarity_search(user_query, k=k)
-            logger.info(f"Retrieved {len(docs)} documents.")
+            logger.debug("Running vector similarity search for: %s (filter=%s)", user_query, filter)
+            docs: List["Document"] = self.vectorstore.similarity_search(user_query, k=k, filter=filter)
+            logger.info("Retrieved %d documents (k=%d, query length %d).", len(docs), k, len(user_query))
 
             return [
                 {
@@ -46,3 +131,14 @@ class QueryService:
         except Exception as e:
             logger.error(f"Error in query: {e}", exc_info=True)
             return [{"error": str(e)}]
+
+    def _query_snapshot(self, snapshot: Union["VectorSnapshot", "ShardedIndex"], user_query: str, k: int, filter: Optional[Dict[str, Any]]) -> List[Dict]:
+        try:
+            logger.debug("Running snapshot similarity search for: %s (filter=%s)", user_query, filter)
+            hits = snapshot.search(self.embedding_model.embed_query(user_query), k=k, filter=filter)
+            logger.info("Retrieved %d documents (k=%d, query length %d).", len(hits), k, len(user_query))
+
+            return [snapshot.record(ref) for _, ref in hits]
+        except Exception as e:
+            logger.error(f"Error in query: {e}", exc_info=True)
+            return [{"error": str(e)}]
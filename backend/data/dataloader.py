@@ -3,9 +3,9 @@ import hashlib
 import logging
 import re
 from datetime import datetime
-from typing import List, Dict, Any
+from functools import cached_property
+from typing import List, Dict, Any, Tuple
 
-import tiktoken
 from .ocr_extract import OCRTextExtractor
 from ..app.core.cache_cls import CacheMemory
 
@@ -16,11 +16,6 @@ class DataLoader:
     def __init__(self, file_path="dataset/", extensions=('pdf', 'png', 'jpg', 'jpeg'), cache_file="ocr_cache.pkl"):
         self.file_path = file_path
         self.extensions = extensions
-        try:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        except Exception as e:
-            logger.error(f"Failed to initialize tokenizer: {e}")
-            raise
         self.cache = CacheMemory(cache_file)
         try:
             self._entities = [
@@ -32,6 +27,17 @@ class DataLoader:
             logger.error(f"Error listing files in {self.file_path}: {e}")
             self._entities = []
 
+    @cached_property
+    def tokenizer(self):
+        # tiktoken may fetch the BPE ranks over the network, so defer it to first chunking.
+        try:
+            import tiktoken
+
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.error(f"Failed to initialize tokenizer: {e}")
+            raise
+
     def _hash_file(self, path: str) -> str | None:
         sha = hashlib.sha256()
         try:
@@ -79,6 +85,28 @@ class DataLoader:
             logger.error(f"Error chunking text on page {page}: {e}")
             return []
 
+    def _ocr_pdf_pages(self, extractor: OCRTextExtractor, path: str) -> List[Tuple[int, str]]:
+        """OCR only the pages whose fingerprint is not already cached."""
+        pages = []
+        missed = 0
+        try:
+            for page_num, page_hash, page in extractor.iter_pdf_pages(path):
+                page_key = f"page:{page_hash}"
+                cached_page = self.cache.get(page_key)
+                if cached_page is not None:
+                    text = cached_page["text"]
+                else:
+                    text = extractor.ocr_page(page)
+                    self.cache.set(page_key, {"text": text}, persist=False)
+                    missed += 1
+                pages.append((page_num, text))
+        finally:
+            # Keep the pages already paid for even if a later page fails.
+            if missed:
+                self.cache.save()
+        logger.info(f"OCR'd {missed} of {len(pages)} pages for {path}, reused the rest from cache")
+        return pages
+
     def read_and_process(self) -> List[Dict[str, Any]]:
         extractor = OCRTextExtractor()
         results = []
@@ -104,7 +132,7 @@ class DataLoader:
                 else:
                     ext = os.path.splitext(path)[-1].lower()
                     try:
-                        pages = extractor.ocr_pdf(path) if ext == ".pdf" else extractor.ocr_image(path)
+                        pages = self._ocr_pdf_pages(extractor, path) if ext == ".pdf" else extractor.ocr_image(path)
                     except Exception as e:
                         logger.error(f"OCR failed for {path}: {e}")
                         continue
@@ -1,15 +1,22 @@
 import re
+import hashlib
 import logging
-from typing import Tuple, List
-from PIL import Image
-import pytesseract
-import pdfplumber
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
 logger = logging.getLogger(__name__)
 
 # Tesseract path — change if needed
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+@lru_cache(maxsize=None)
+def _pytesseract():
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
 
 
 class OCRTextExtractor:
@@ -20,21 +27,95 @@ class OCRTextExtractor:
         text = re.sub(r'\x0c', '', text)
         return text
 
+    @staticmethod
+    def _hash_object(obj: Any, sha: "hashlib._Hash", memo: Dict[int, bytes]) -> None:
+        # Canonical hash of a PDF object graph: dict keys sorted, references
+        # followed, stream bodies included. Indirect objects are hashed once per
+        # document (fonts and images are shared between pages) and a reference
+        # back into an object still being hashed stands for itself, so cycles end.
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        from pdfminer.psparser import PSKeyword, PSLiteral
+
+        if isinstance(obj, PDFObjRef):
+            if obj.objid not in memo:
+                memo[obj.objid] = b"ref:%d" % obj.objid
+                sub = hashlib.sha256()
+                OCRTextExtractor._hash_object(obj.resolve(), sub, memo)
+                memo[obj.objid] = sub.digest()
+            sha.update(memo[obj.objid])
+        elif isinstance(obj, PDFStream):
+            sha.update(b"s")
+            OCRTextExtractor._hash_object(obj.attrs, sha, memo)
+            sha.update(obj.get_data())
+        elif isinstance(obj, dict):
+            sha.update(b"d%d" % len(obj))
+            for key in sorted(obj, key=str):
+                sha.update(str(key).encode() + b"\x00")
+                OCRTextExtractor._hash_object(obj[key], sha, memo)
+        elif isinstance(obj, (list, tuple)):
+            sha.update(b"l%d" % len(obj))
+            for item in obj:
+                OCRTextExtractor._hash_object(item, sha, memo)
+        elif isinstance(obj, (PSLiteral, PSKeyword)):
+            sha.update(b"n" + str(obj.name).encode() + b"\x00")
+        else:
+            sha.update(repr(obj).encode() + b"\x00")
+
+    @staticmethod
+    def page_fingerprint(page, memo: Optional[Dict[int, bytes]] = None) -> str:
+        """Hash of a pdfplumber page's content streams and its whole /Resources
+        dictionary (XObjects, fonts, ExtGState, ...).
+
+        Pass the same ``memo`` for every page of one open document.
+        """
+        from pdfminer.pdftypes import resolve1
+
+        sha = hashlib.sha256()
+        try:
+            page_obj = page.page_obj
+            sha.update(repr((page_obj.mediabox, page_obj.rotate)).encode())
+            for stream in page_obj.contents or []:
+                sha.update(resolve1(stream).get_data())
+            OCRTextExtractor._hash_object(page_obj.resources, sha, {} if memo is None else memo)
+        except Exception as e:
+            logger.warning(f"Falling back to rendered-image hash for page {page.page_number}: {e}")
+            sha = hashlib.sha256(page.to_image(resolution=72).original.convert("RGB").tobytes())
+        return sha.hexdigest()
+
+    @staticmethod
+    def ocr_page(page) -> str:
+        pytesseract = _pytesseract()
+        image = page.to_image(resolution=300).original.convert("RGB")
+        return OCRTextExtractor.clean_text(pytesseract.image_to_string(image))
+
+    @staticmethod
+    def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, str, Any]]:
+        """Yield ``(page_num, fingerprint, page)`` while the PDF is open."""
+        import pdfplumber
+
+        memo: Dict[int, bytes] = {}
+        with pdfplumber.open(file_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, start=1):
+                yield page_num, OCRTextExtractor.page_fingerprint(page, memo), page
+
     @staticmethod
     def ocr_pdf(file_path: str) -> List[Tuple[int, str]]:
+        import pdfplumber
+
         results = []
         try:
             with pdfplumber.open(file_path) as pdf:
                 for page_num, page in enumerate(pdf.pages, start=1):
-                    image = page.to_image(resolution=300).original.convert("RGB")
-                    text = pytesseract.image_to_string(image)
-                    results.append((page_num, OCRTextExtractor.clean_text(text)))
+                    results.append((page_num, OCRTextExtractor.ocr_page(page)))
         except Exception as e:
             logger.error(f"OCR failed for PDF {file_path}: {e}")
         return results
 
     @staticmethod
     def ocr_image(file_path: str) -> List[Tuple[int, str]]:
+        from PIL import Image
+
+        pytesseract = _pytesseract()
         try:
             image = Image.open(file_path).convert("RGB")
             text = pytesseract.image_to_string(image)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from backend.data.dataloader import DataLoader
+
+
+class FakeTokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+class FakeExtractor:
+    """Stands in for OCRTextExtractor; each "PDF" is a list of page strings."""
+
+    documents = {}
+    ocr_calls = []
+
+    def iter_pdf_pages(self, path):
+        for page_num, content in enumerate(self.documents[path], start=1):
+            yield page_num, f"hash-{content}", content
+
+    def ocr_page(self, page):
+        self.ocr_calls.append(page)
+        return f"text of {page}."
+
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf = os.path.join(self.tmp.name, "scan.pdf")
+        self.cache_file = os.path.join(self.tmp.name, "ocr_cache.pkl")
+        FakeExtractor.ocr_calls = []
+        patcher = mock.patch("backend.data.dataloader.OCRTextExtractor", FakeExtractor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _process(self, pages, file_bytes):
+        with open(self.pdf, "wb") as fh:
+            fh.write(file_bytes)
+        FakeExtractor.documents = {self.pdf: pages}
+        loader = DataLoader(file_path=self.tmp.name, cache_file=self.cache_file)
+        loader.tokenizer = FakeTokenizer()
+        return loader.read_and_process()
+
+    def test_only_changed_and_new_pages_are_ocrd(self):
+        self._process(["p1", "p2", "p3"], b"v1")
+        self.assertEqual(["p1", "p2", "p3"], FakeExtractor.ocr_calls)
+
+        FakeExtractor.ocr_calls = []
+        results = self._process(["p1", "p2-edited", "p3", "p4"], b"v2")
+        self.assertEqual(["p2-edited", "p4"], FakeExtractor.ocr_calls)
+        self.assertEqual(
+            ["text of p1.", "text of p2-edited.", "text of p3.", "text of p4."],
+            [chunk["text"] for chunk in results[0]["chunks"]],
+        )
+        self.assertEqual([1, 2, 3, 4], [chunk["page"] for chunk in results[0]["chunks"]])
+
+    def test_unchanged_file_uses_file_entry(self):
+        self._process(["p1"], b"same")
+        FakeExtractor.ocr_calls = []
+        results = self._process(["p1"], b"same")
+        self.assertEqual([], FakeExtractor.ocr_calls)
+        self.assertEqual("text of p1.", results[0]["chunks"][0]["text"])
+
+
+if __name__ == '__main__':
+    unittest.main()
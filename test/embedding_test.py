@@ -0,0 +1,76 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from backend.app.services.embedding import EmbeddingService, _worker_threads, physical_cores, plan_length_buckets
+
+
+class LengthBucketTestCase(unittest.TestCase):
+    def test_every_index_planned_once(self):
+        lengths = [300, 5, 40, 1000, 12, 70, 33]
+        plan = plan_length_buckets(lengths)
+        self.assertEqual(sorted(range(len(lengths))), sorted(i for indices, _ in plan for i in indices))
+
+    def test_buckets_sorted_and_batches_shrink_with_length(self):
+        lengths = [300, 5, 40, 1000, 12, 70, 33]
+        plan = plan_length_buckets(lengths, tokens_per_batch=1024, max_batch_size=16)
+        self.assertEqual(
+            [([1, 4], 16), ([6, 2], 16), ([5], 8), ([0, 3], 2)],
+            plan,
+        )
+
+
+class BulkEmbeddingTestCase(unittest.TestCase):
+    def test_worker_thread_env_is_restored(self):
+        with mock.patch.dict(os.environ, {"OMP_NUM_THREADS": "8"}, clear=False):
+            os.environ.pop("MKL_NUM_THREADS", None)
+            with _worker_threads(2):
+                self.assertEqual("2", os.environ["OMP_NUM_THREADS"])
+                self.assertEqual("2", os.environ["MKL_NUM_THREADS"])
+            self.assertEqual("8", os.environ["OMP_NUM_THREADS"])
+            self.assertNotIn("MKL_NUM_THREADS", os.environ)
+
+    def _service_with_fake_model(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        service = EmbeddingService(vb_path=tmp.name, cache_file=os.path.join(tmp.name, "cache.pkl"))
+        client = mock.Mock()
+        client.tokenizer = lambda texts, truncation: {"input_ids": [t.split() for t in texts]}
+        client.encode.side_effect = lambda texts, **kw: np.ones((len(texts), 4), dtype=np.float32)
+        client.encode_multi_process.side_effect = lambda texts, pool, **kw: np.ones((len(texts), 4), dtype=np.float32)
+        service.model = SimpleNamespace(_client=client)
+        return service, client
+
+    def test_small_input_is_encoded_in_process(self):
+        service, client = self._service_with_fake_model()
+        embeddings = service.embed_bulk(["a few words"] * 10, processes=4)
+        self.assertEqual(10, len(embeddings))
+        client.start_multi_process_pool.assert_not_called()
+
+    def test_pool_is_sized_to_the_input(self):
+        service, client = self._service_with_fake_model()
+        texts = ["a few words"] * (2 * EmbeddingService.POOL_MIN_TEXTS_PER_PROCESS)
+        service.embed_bulk(texts, processes=8)
+        client.start_multi_process_pool.assert_called_once_with(target_devices=["cpu"] * 2)
+        client.stop_multi_process_pool.assert_called_once()
+
+    @unittest.skipUnless(importlib.util.find_spec("sentence_transformers"), "sentence-transformers is not installed")
+    @unittest.skipIf(physical_cores() < 2, "needs at least two physical cores")
+    def test_pool_beats_single_process(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        service = EmbeddingService(vb_path=tmp.name, cache_file=os.path.join(tmp.name, "cache.pkl"))
+        texts = [("short text " * (i % 7 + 1)) + ("a much longer passage " * (i % 40)) for i in range(2000)]
+        rates = service.measure_bulk_throughput(texts)
+        print(f"\nbulk embedding: single={rates['single']:.1f} chunks/s, "
+              f"pool={rates['pool']:.1f} chunks/s, speedup={rates['speedup']:.2f}x")
+        self.assertGreater(rates["speedup"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
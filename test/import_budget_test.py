@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a cold `import <module>` may take in a fresh interpreter.
+IMPORT_BUDGET = float(os.environ.get("IMPORT_BUDGET_SECONDS", "2.0"))
+
+MODULES = [
+    "backend.app.config",
+    "backend.app.core.logger",
+    "backend.app.core.cache_cls",
+    "backend.app.core.database_api",
+    "backend.app.core.database_vb",
+    "backend.app.models.api_models",
+    "backend.app.api.routers",
+    "backend.app.services.embedding",
+    "backend.app.services.query",
+    "backend.data.ocr_extract",
+    "backend.data.dataloader",
+]
+
+# Nothing on the import path should load these; they belong to first use.
+HEAVY = ["torch", "sentence_transformers", "langchain", "langchain_community",
+         "langchain_huggingface", "langchain_chroma", "chromadb", "supabase",
+         "tiktoken", "pytesseract", "pdfplumber"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    __import__(sys.argv[1])
+except ModuleNotFoundError as e:
+    print(json.dumps({"missing": e.name}))
+    raise SystemExit(0)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def measure(module: str) -> dict:
+    env = dict(os.environ)
+    # Scrub config so a bad environment cannot be masked by a local .env.
+    for key in ("HUGGING_FACE_KEY", "SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_ROLE_KEY", "BUCKET_NAME"):
+        env.pop(key, None)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, module, *HEAVY],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if out.returncode != 0:
+        raise AssertionError(f"import {module} failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class ImportBudgetTestCase(unittest.TestCase):
+    def test_import_cost_per_module(self):
+        report = {}
+        for module in MODULES:
+            with self.subTest(module=module):
+                result = measure(module)
+                if "missing" in result:
+                    missing = result["missing"] or ""
+                    # A missing module of our own is a broken import, not an absent dependency.
+                    if not missing or missing.split(".")[0] == "backend":
+                        report[module] = f"FAILED (missing {missing or '?'})"
+                        self.fail(f"import {module} failed: no module named {missing!r}")
+                    report[module] = f"skipped (missing {missing})"
+                    self.skipTest(f"third-party dependency {missing} is not installed")
+                report[module] = f"{result['seconds'] * 1000:.1f} ms"
+                self.assertEqual([], result["heavy"], f"{module} imported heavy dependencies eagerly")
+                self.assertLess(result["seconds"], IMPORT_BUDGET, f"{module} exceeded the import budget")
+
+        width = max(len(m) for m in report)
+        print("\nimport cost (fresh interpreter):")
+        for module, cost in report.items():
+            print(f"  {module:<{width}}  {cost}")
+
+
+if __name__ == '__main__':
+    unittest.main()
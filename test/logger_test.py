@@ -0,0 +1,139 @@
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+from logging.handlers import QueueHandler
+
+from backend.app.core import logger as logger_module
+from backend.app.core.logger import ListenerQueueHandler, RateLimitFilter, setup_logger
+
+
+def _record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("t", level, __file__, 0, msg, None, None)
+
+
+class LoggerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    @staticmethod
+    def _listener(logger: logging.Logger):
+        return next(h.listener for h in logger.handlers if isinstance(h, ListenerQueueHandler))
+
+    def _flush(self, logger: logging.Logger):
+        # Stops (and drains) only this logger's listener; other modules keep theirs
+        listener = self._listener(logger)
+        listener.stop()
+        if listener in logger_module._listeners:
+            logger_module._listeners.remove(listener)
+
+    def _read(self, name: str):
+        with open(os.path.join(self.tmp.name, f"{name}.log")) as fh:
+            return [json.loads(line) for line in fh]
+
+    def _logger(self, name: str, **kwargs) -> logging.Logger:
+        # Console handlers bind sys.stderr when created, including those behind a queue
+        devnull = open(os.devnull, "w")
+        self.addCleanup(devnull.close)
+        with contextlib.redirect_stderr(devnull):
+            logger = setup_logger(name, log_file_path=os.path.join(self.tmp.name, f"{name}.log"), **kwargs)
+        self.addCleanup(lambda: [logger.removeHandler(h) for h in list(logger.handlers)])
+        self.addCleanup(lambda: [logger.removeFilter(f) for f in list(logger.filters)])
+        if kwargs.get("use_queue"):
+            self.addCleanup(self._flush, logger)
+        return logger
+
+    def test_rate_limit_keeps_warnings(self):
+        f = RateLimitFilter(max_per_interval=3, interval=60)
+        kept = sum(f.filter(_record("hot %s")) for _ in range(100))
+        self.assertEqual(3, kept)
+        self.assertTrue(f.filter(_record("hot %s", logging.WARNING)))
+        self.assertTrue(f.filter(_record("other message")))
+
+    def test_state_is_bounded(self):
+        f = RateLimitFilter(max_per_interval=1, max_keys=50)
+        for i in range(1000):
+            f.filter(_record(f"f-string message {i}"))
+        self.assertEqual(50, len(f._state))
+
+    def test_configures_logger_when_root_has_handlers(self):
+        root = logging.getLogger()
+        handler = logging.NullHandler()
+        root.addHandler(handler)
+        self.addCleanup(root.removeHandler, handler)
+        logger = self._logger("behind_root", use_queue=True, rate_limit=5)
+        self.assertTrue(any(isinstance(h, QueueHandler) for h in logger.handlers))
+        self.assertTrue(any(isinstance(f, RateLimitFilter) for f in logger.filters))
+        self.assertFalse(logger.propagate)
+
+    def test_sampling(self):
+        f = RateLimitFilter(sample_every=10)
+        kept = sum(f.filter(_record("sampled")) for _ in range(100))
+        self.assertEqual(10, kept)
+
+    def test_queue_json_output(self):
+        logger = self._logger("queued_json", use_queue=True, json_format=True)
+        logger.info("hello %s", "world")
+        self._flush(logger)
+        line = self._read("queued_json")[0]
+        self.assertEqual("hello world", line["message"])
+        self.assertEqual("INFO", line["level"])
+
+    def test_queue_json_keeps_traceback(self):
+        logger = self._logger("queued_exc", use_queue=True, json_format=True)
+        try:
+            raise ValueError("bad input")
+        except ValueError:
+            logger.exception("failed for %s", "doc-1")
+        self._flush(logger)
+        line = self._read("queued_exc")[0]
+        self.assertEqual("failed for doc-1", line["message"])
+        self.assertIn("ValueError: bad input", line["exc_info"])
+
+    def test_listener_starts_on_first_record(self):
+        logger = self._logger("lazy", use_queue=True)
+        listener = self._listener(logger)
+        self.assertIsNone(listener._thread)
+        logger.info("first")
+        self.assertIsNotNone(listener._thread)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_listener_restarts_in_forked_child(self):
+        logger = self._logger("forked", use_queue=True, json_format=True)
+        logger.info("parent")
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                logger.info("child")
+                self._listener(logger).stop()
+                status = 0
+            finally:
+                os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(0, os.waitstatus_to_exitcode(status))
+        self._flush(logger)
+        self.assertEqual({"parent", "child"}, {line["message"] for line in self._read("forked")})
+
+    def test_queue_overhead(self):
+        n = 5000
+        timings = {}
+        for name, kwargs in (("sync", {}), ("queued", {"use_queue": True}),
+                             ("queued_limited", {"use_queue": True, "rate_limit": 50})):
+            logger = self._logger(f"overhead_{name}", **kwargs)
+            start = time.perf_counter()
+            for i in range(n):
+                logger.info("request %d served", i)
+            timings[name] = time.perf_counter() - start
+            if kwargs.get("use_queue"):
+                self._flush(logger)
+        print("\nper-call logging cost: " + ", ".join(f"{k}={v / n * 1e6:.1f}us" for k, v in timings.items()))
+        self.assertLess(timings["queued_limited"], timings["sync"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import unittest
+
+from backend.data.ocr_extract import OCRTextExtractor
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "backend", "data", "dataset")
+PDF = os.path.join(DATASET, "84.pdf")
+
+
+@unittest.skipUnless(importlib.util.find_spec("pdfplumber"), "pdfplumber not installed")
+class PageFingerprintTestCase(unittest.TestCase):
+    def _fingerprints(self):
+        return [fp for _, fp, _ in OCRTextExtractor.iter_pdf_pages(PDF)]
+
+    def test_stable_across_reopening(self):
+        self.assertEqual(self._fingerprints(), self._fingerprints())
+
+    def test_pages_differ(self):
+        fingerprints = self._fingerprints()
+        self.assertGreater(len(fingerprints), 1)
+        self.assertEqual(len(fingerprints), len(set(fingerprints)))
+
+    def test_resources_beyond_xobjects_count(self):
+        import pdfplumber
+
+        with pdfplumber.open(PDF) as pdf:
+            page = pdf.pages[0]
+            before = OCRTextExtractor.page_fingerprint(page)
+            page.page_obj.resources = dict(page.page_obj.resources, ExtGState={"GS9": {"CA": 0.5}})
+            self.assertNotEqual(before, OCRTextExtractor.page_fingerprint(page))
+
+
+if __name__ == '__main__':
+    unittest.main()
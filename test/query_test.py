@@ -1,4 +1,12 @@
+import importlib.util
+import os
+import time
 import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from backend.app.services.query import QueryService, build_metadata_filter
 
 
 class MyTestCase(unittest.TestCase):
@@ -6,5 +14,84 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(True, False)  # add assertion here
 
 
+class MetadataFilterTestCase(unittest.TestCase):
+    def test_no_constraints(self):
+        self.assertIsNone(build_metadata_filter())
+
+    def test_single_constraint(self):
+        self.assertEqual({"filename": {"$eq": "84.pdf"}}, build_metadata_filter(filename="84.pdf"))
+
+    def test_combined_constraints(self):
+        after = datetime(2025, 5, 1)
+        where = build_metadata_filter(filename=["a.pdf", "b.pdf"], page_range=(2, 5), uploaded_after=after)
+        self.assertEqual(
+            {"$and": [
+                {"filename": {"$in": ["a.pdf", "b.pdf"]}},
+                {"page": {"$gte": 2}},
+                {"page": {"$lte": 5}},
+                {"upload_ts": {"$gte": after.timestamp()}},
+            ]},
+            where,
+        )
+
+
+@unittest.skipUnless(importlib.util.find_spec("chromadb") and importlib.util.find_spec("langchain_chroma"),
+                     "chromadb / langchain_chroma not installed")
+class ChromaFilterTestCase(unittest.TestCase):
+    FILES = [f"doc{i}.pdf" for i in range(20)]
+    PAGES = 10
+
+    def setUp(self):
+        import chromadb
+        from langchain_chroma import Chroma
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        settings = SimpleNamespace(VECTOR_DB_PATH="unused", VECTOR_SNAPSHOT_PATH=None, VECTOR_SNAPSHOT_VERIFY=False,
+                                   HUGGING_FACE_KEY=SimpleNamespace(get_secret_value=lambda: "test"))
+        for patcher in (mock.patch("backend.app.services.query.get_settings", return_value=settings),
+                        mock.patch.dict(os.environ)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        client = chromadb.EphemeralClient()
+        name = f"filter_{id(self)}"
+        store = Chroma(client=client, collection_name=name, embedding_function=DeterministicFakeEmbedding(size=64))
+        self.addCleanup(client.delete_collection, name)
+        texts, metadatas = [], []
+        for filename in self.FILES:
+            for page in range(1, self.PAGES + 1):
+                for paragraph in range(5):
+                    texts.append(f"{filename} page {page} paragraph {paragraph}")
+                    metadatas.append({"filename": filename, "page": page, "paragraph": paragraph})
+        store.add_texts(texts, metadatas=metadatas)
+
+        self.service = QueryService()
+        self.service.vectorstore = store
+
+    def test_filtered_query_returns_k_matching_chunks(self):
+        where = build_metadata_filter(filename=["doc3.pdf", "doc7.pdf"], page_range=(2, 4))
+        hits = self.service.query("doc3 page 2", k=8, filter=where)
+        self.assertEqual(8, len(hits))
+        for hit in hits:
+            self.assertIn(hit["metadata"]["filename"], ("doc3.pdf", "doc7.pdf"))
+            self.assertTrue(2 <= hit["metadata"]["page"] <= 4)
+
+        # A filter narrower than k returns exactly what matches
+        hits = self.service.query("anything", k=8, filter=build_metadata_filter(filename="doc5.pdf", page=9))
+        self.assertEqual(5, len(hits))
+
+    def test_filter_cost(self):
+        where = build_metadata_filter(filename=["doc3.pdf", "doc7.pdf"], page_range=(2, 4))
+        n = 50
+        timings = {}
+        for name, clause in (("unfiltered", None), ("filtered", where)):
+            self.service.query("warm up", k=5, filter=clause)
+            start = time.perf_counter()
+            for i in range(n):
+                self.service.query(f"query {i}", k=5, filter=clause)
+            timings[name] = (time.perf_counter() - start) / n
+        print("\nchroma query cost (1000 chunks): " + ", ".join(f"{k}={v * 1e3:.2f}ms" for k, v in timings.items()))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,153 @@
+import importlib.util
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from backend.app.core.database_vb import (
+    MANIFEST, MANIFEST_PREV, ShardedIndex, available_cores, export_sharded_snapshot, limit_blas_threads,
+    rebalance_shards, shard_for,
+)
+
+
+def _corpus(n: int, dim: int, seed: int = 0, prefix: str = "doc"):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"{prefix}-{i}" for i in range(n)]
+    metadatas = [{"filename": f"{prefix}{i // 10}.pdf", "page": i % 10} for i in range(n)]
+    return ids, vectors, [f"chunk {i}" for i in ids], metadatas
+
+
+class ShardingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_dir = os.path.join(self.tmp.name, "index")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_unsharded_search(self):
+        ids, vectors, texts, metadatas = _corpus(500, 32)
+        export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=4)
+        index = ShardedIndex.load(self.index_dir)
+        self.assertEqual(500, len(index))
+
+        query = vectors[123]
+        expected = [ids[i] for i in np.argsort(-(vectors @ query))[:10]]
+        hits = index.search(query, k=10)
+        got = [index.shards[shard].ids[row] for _, (shard, row) in hits]
+        self.assertEqual(expected, got)
+        self.assertEqual("chunk doc-123", index.record(hits[0][1])["text"])
+
+    def test_document_chunks_share_a_shard(self):
+        ids, vectors, texts, metadatas = _corpus(100, 8)
+        export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=3)
+        index = ShardedIndex.load(self.index_dir)
+        for shard_no, shard in enumerate(index.shards):
+            for meta in shard.metadatas:
+                self.assertEqual(shard_no, shard_for(meta["filename"], 3))
+
+    def test_rebalance_adds_documents_and_reuses_unchanged_shards(self):
+        ids, vectors, texts, metadatas = _corpus(200, 8)
+        before = export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=4)
+
+        new_ids, new_vectors, new_texts, new_metadatas = _corpus(10, 8, seed=1, prefix="new")
+        after = rebalance_shards(self.index_dir, ids=new_ids, embeddings=new_vectors,
+                                 texts=new_texts, metadatas=new_metadatas)
+        changed = [b["file"] != a["file"] for b, a in zip(before["shards"], after["shards"])]
+        self.assertEqual([shard_for("new0.pdf", 4) == i for i in range(4)], changed)
+        self.assertEqual(210, len(ShardedIndex.load(self.index_dir)))
+
+        grown = rebalance_shards(self.index_dir, n_shards=6)
+        self.assertEqual(6, len(grown["shards"]))
+        self.assertEqual(210, sum(s["count"] for s in grown["shards"]))
+        on_disk = {f for f in os.listdir(self.index_dir) if f.endswith(".snap")}
+        self.assertEqual({s["file"] for s in grown["shards"]} | {s["file"] for s in after["shards"]}, on_disk)
+
+    def test_previous_generation_stays_loadable(self):
+        ids, vectors, texts, metadatas = _corpus(100, 8)
+        export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=3)
+        # A replica that read the manifest just before the next export
+        with open(os.path.join(self.index_dir, MANIFEST)) as fh:
+            stale = json.load(fh)
+
+        export_sharded_snapshot(self.index_dir, ids, vectors * -1, texts, metadatas, n_shards=3)
+        for entry in stale["shards"]:
+            self.assertTrue(os.path.exists(os.path.join(self.index_dir, entry["file"])))
+        with open(os.path.join(self.index_dir, MANIFEST_PREV)) as fh:
+            self.assertEqual(stale, json.load(fh))
+
+        # Two generations later the stale files are pruned
+        export_sharded_snapshot(self.index_dir, ids, vectors * 2, texts, metadatas, n_shards=3)
+        for entry in stale["shards"]:
+            self.assertFalse(os.path.exists(os.path.join(self.index_dir, entry["file"])))
+
+    def test_more_shards_than_documents(self):
+        ids, vectors, texts, metadatas = _corpus(20, 8)  # two documents
+        manifest = export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=8)
+        self.assertEqual(20, sum(s["count"] for s in manifest["shards"]))
+        self.assertGreaterEqual(sum(s["count"] == 0 for s in manifest["shards"]), 6)
+
+        index = ShardedIndex.load(self.index_dir)
+        hits = index.search(vectors[3], k=5)
+        self.assertEqual(5, len(hits))
+        self.assertEqual("chunk doc-3", index.record(hits[0][1])["text"])
+        self.assertEqual([], index.search(vectors[3], k=5, filter={"filename": {"$eq": "missing.pdf"}}))
+
+    def test_close_releases_worker_threads(self):
+        ids, vectors, texts, metadatas = _corpus(100, 8)
+        export_sharded_snapshot(self.index_dir, ids, vectors, texts, metadatas, n_shards=4)
+        index = ShardedIndex.load(self.index_dir, max_workers=4)
+        index.search(vectors[0], k=3)
+        pool = index.pool
+        del index
+        self.assertTrue(pool._shutdown)
+
+    @unittest.skipIf(available_cores() < 2, "fan-out scaling needs at least two cores")
+    @unittest.skipUnless(importlib.util.find_spec("threadpoolctl"), "threadpoolctl is not installed")
+    def test_fan_out_latency(self):
+        cores = available_cores()
+        ids, vectors, texts, metadatas = _corpus(200_000, 128)
+        query = vectors[0]
+
+        def latency(index):
+            # Best of several batches, so one noisy batch can't decide the assertion.
+            hits = index.search(query, k=10)
+            self.assertEqual("doc-0", index.shards[hits[0][1][0]].ids[hits[0][1][1]])
+            batches = []
+            for _ in range(5):
+                start = time.perf_counter()
+                for _ in range(10):
+                    index.search(query, k=10)
+                batches.append((time.perf_counter() - start) / 10)
+            return min(batches)
+
+        timings = {}
+        for n_shards in sorted({1, 2, cores}):
+            index_dir = os.path.join(self.tmp.name, f"index-{n_shards}")
+            export_sharded_snapshot(index_dir, ids, vectors, texts, metadatas, n_shards=n_shards)
+            index = ShardedIndex.load(index_dir, verify=False)
+            if n_shards == 1:
+                from threadpoolctl import threadpool_limits
+
+                with threadpool_limits(limits=cores, user_api="blas"):
+                    timings["1 (BLAS threads)"] = latency(index)
+                # One core doing the whole scan: the baseline the fan-out should divide.
+                limit_blas_threads(1)
+                timings["1 (1 thread)"] = latency(index)
+            else:
+                timings[str(n_shards)] = latency(index)
+            index.close()
+
+        print("\nquery latency by shard count: " + ", ".join(f"{n}={t * 1000:.2f}ms" for n, t in timings.items()))
+        speedup = timings["1 (1 thread)"] / timings[str(cores)]
+        print(f"speedup over one core with {cores} shards: {speedup:.2f}x")
+        # Well short of linear: the scan is partly memory-bandwidth bound.
+        self.assertGreater(speedup, 1.3)
+
+if __name__ == '__main__':
+    unittest.main()
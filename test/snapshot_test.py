@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from backend.app.core.database_vb import VectorSnapshot, export_snapshot, verify_snapshot
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index.snap")
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(200, 16)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.metadatas = [
+            {"filename": f"doc{i % 4}.pdf", "page": i % 10, "paragraph": 1, "upload_ts": float(i)}
+            for i in range(200)
+        ]
+        export_snapshot(
+            self.path,
+            ids=[f"id{i}" for i in range(200)],
+            embeddings=self.vectors,
+            texts=[f"chunk {i}" for i in range(200)],
+            metadatas=self.metadatas,
+            model_name="all-MiniLM-L6-v2",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_search(self):
+        start = time.perf_counter()
+        snapshot = VectorSnapshot.load(self.path)
+        print(f"\nsnapshot load: {(time.perf_counter() - start) * 1000:.1f} ms")
+        self.assertEqual(200, len(snapshot))
+        self.assertEqual("chunk 7", snapshot.texts[7])
+        np.testing.assert_array_equal(self.vectors, snapshot.vectors)
+
+        hits = snapshot.search(self.vectors[42], k=5)
+        self.assertEqual(42, hits[0][1])
+        self.assertEqual(5, len(hits))
+        self.assertEqual(sorted((s for s, _ in hits), reverse=True), [s for s, _ in hits])
+
+    def test_filter_returns_k_matching_rows(self):
+        snapshot = VectorSnapshot.load(self.path)
+        where = {"$and": [{"filename": {"$eq": "doc1.pdf"}}, {"page": {"$in": [1, 5]}}, {"upload_ts": {"$gte": 50.0}}]}
+        hits = snapshot.search(self.vectors[0], k=4, filter=where)
+        self.assertEqual(4, len(hits))
+        for _, row in hits:
+            meta = snapshot.metadatas[row]
+            self.assertEqual("doc1.pdf", meta["filename"])
+            self.assertIn(meta["page"], (1, 5))
+            self.assertGreaterEqual(meta["upload_ts"], 50.0)
+
+    def test_filter_does_not_decode_chunk_text(self):
+        snapshot = VectorSnapshot.load(self.path)
+        hits = snapshot.search(self.vectors[0], k=3, filter={"filename": {"$eq": "doc2.pdf"}})
+        self.assertEqual(3, len(hits))
+        self.assertNotIn("_records", snapshot.__dict__)
+        self.assertEqual(f"chunk {hits[0][1]}", snapshot.record(hits[0][1])["text"])
+
+    def test_corruption_is_detected_by_verify(self):
+        with open(self.path, "r+b") as fh:
+            fh.seek(-5, os.SEEK_END)
+            fh.write(b"XXXXX")
+        with self.assertRaises(ValueError):
+            VectorSnapshot.load(self.path, verify=True)
+        with self.assertRaises(ValueError):
+            verify_snapshot(self.path)
+
+    def test_default_load_checks_header_only(self):
+        with open(self.path, "r+b") as fh:
+            fh.seek(-5, os.SEEK_END)
+            fh.write(b"XXXXX")
+        snapshot = VectorSnapshot.load(self.path)
+        self.assertEqual({"text": "chunk 3", "metadata": self.metadatas[3]}, snapshot.record(3))
+
+    def test_truncation_is_detected_without_verify(self):
+        with open(self.path, "r+b") as fh:
+            fh.truncate(os.path.getsize(self.path) - 10)
+        with self.assertRaises(ValueError):
+            VectorSnapshot.load(self.path)
+
+    def test_empty_snapshot(self):
+        path = os.path.join(self.tmp.name, "empty.snap")
+        export_snapshot(path, ids=[], embeddings=[], texts=[], metadatas=[], dim=16)
+        snapshot = VectorSnapshot.load(path)
+        self.assertEqual(0, len(snapshot))
+        self.assertEqual((0, 16), snapshot.vectors.shape)
+        self.assertEqual([], snapshot.search(self.vectors[0], k=5))
+        self.assertEqual([], snapshot.search(self.vectors[0], k=5, filter={"page": {"$eq": 1}}))
+
+
+if __name__ == '__main__':
+    unittest.main()